@@ -1,16 +1,126 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 from pyairtable import Api
+from requests import HTTPError
+from urllib3.util.retry import Retry
+import hashlib
+import importlib.util
+import os
+import json
+import base64
+from pathlib import Path
+import stat
+import tempfile
+import time
+
+# Use the numba groupby engine when numba is installed, otherwise fall back to cython. Only the
+# spec is looked up, so numba itself is imported (by pandas) the first time the engine is used
+if importlib.util.find_spec('numba') is not None:
+    AGG_ENGINE = 'numba'
+    AGG_ENGINE_KWARGS = {'nopython': True, 'nogil': True, 'parallel': True}
+else:
+    AGG_ENGINE = None
+    AGG_ENGINE_KWARGS = None
+
+# Below this many rows the cython groupby beats numba's dispatch overhead
+NUMBA_MIN_ROWS = 50_000
+
+# Nutrient columns aggregated per day
+NUTRIENT_COLS = ['Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Sugar (g)', 'Fat (g)',
+                 'Saturated Fat (g)', 'Cholesterol (mg)', 'Fiber (g)', 'Omega-3 (mg)']
+
+# Airtable fields fetched for the dashboard: everything shown in the raw data table except the
+# photo attachments. Notes is free text and is left out of the numeric handling
+AIRTABLE_FIELDS = ['Input Date', 'Item Name'] + NUTRIENT_COLS + ['Notes']
+# Fields the table may not have; Airtable rejects a request naming an unknown field, so the
+# fetch is retried without them
+OPTIONAL_AIRTABLE_FIELDS = ['Notes']
+
+# Timestamp format of Airtable date-time fields, e.g. 2025-04-25T07:01:00.000Z
+AIRTABLE_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Define color palette using earthy tones
+PASTEL_COLORS = {
+    'blue': '#2A9D8F',      # Protein - Teal
+    'green': '#8AB17D',     # Carbs - Sage Green (added to complement theme)
+    'peach': '#F4A261',     # Fat - Peach
+    'pink': '#E76F51',      # Calories - Coral
+    'magenta': '#E29578',   # Sugar - Light Coral (added to complement theme)
+    'orange': '#EFBC9B',    # Saturated Fat - Light Peach (added to complement theme)
+    'purple': '#264653',    # Cholesterol - Dark Teal
+    'yellow_green': '#E9C46A', # Fiber - Yellow/Gold
+    'mint': '#7EBDC3'       # Omega-3 - Light Teal (added to complement theme)
+}
+
+# Map nutrients to their corresponding colors from the new theme
+NUTRIENT_COLORS = {
+    'Calories (kcal)': '#E76F51',      # Coral
+    'Protein (g)': '#2A9D8F',          # Teal
+    'Carbohydrates (g)': '#8AB17D',    # Sage Green
+    'Sugar (g)': '#E29578',            # Light Coral
+    'Fat (g)': '#F4A261',              # Peach
+    'Saturated Fat (g)': '#EFBC9B',    # Light Peach
+    'Cholesterol (mg)': '#264653',     # Dark Teal
+    'Fiber (g)': '#E9C46A',            # Yellow/Gold
+    'Omega-3 (mg)': '#7EBDC3'          # Light Teal
+}
+
+# Summary metric settings: label, column, value format, delta format
+METRICS = [
+    ("Calories", 'Calories (kcal)', "{:.0f} kcal", "{:.0f}"),
+    ("Protein", 'Protein (g)', "{:.1f}g", "{:.1f}"),
+    ("Carbs", 'Carbohydrates (g)', "{:.1f}g", "{:.1f}"),
+    ("Fat", 'Fat (g)', "{:.1f}g", "{:.1f}"),
+    ("Sat. Fat", 'Saturated Fat (g)', "{:.1f}g", "{:.1f}"),
+    ("Cholesterol", 'Cholesterol (mg)', "{:.0f}mg", "{:.0f}"),
+    ("Fiber", 'Fiber (g)', "{:.1f}g", "{:.1f}")
+]
+METRIC_COLS = [key for _, key, _, _ in METRICS]
+
+# Trend chart settings per nutrient: column, bar color, average line color, title, average format
+TREND_CHARTS = {
+    "🔥 Calories": ('Calories (kcal)', PASTEL_COLORS['pink'], "#BA4F3C",
+                   '🔥 Daily Caloric Intake', "{:.0f} kcal"),
+    "🥩 Protein": ('Protein (g)', PASTEL_COLORS['blue'], "#1D7268",
+                  '🥩 Daily Protein Intake', "{:.1f}g"),
+    "🍚 Carbohydrates": ('Carbohydrates (g)', PASTEL_COLORS['green'], "#68935F",
+                        '🍚 Daily Carbohydrate Intake', "{:.1f}g"),
+    "🍯 Sugar": ('Sugar (g)', PASTEL_COLORS['magenta'], "#C17A60",
+                '🍯 Daily Sugar Intake', "{:.1f}g"),
+    "🥑 Fat": ('Fat (g)', PASTEL_COLORS['peach'], "#D28745",
+              '🥑 Daily Fat Intake', "{:.1f}g"),
+    "🧈 Saturated Fat": ('Saturated Fat (g)', PASTEL_COLORS['orange'], "#C9966E",
+                        '🧈 Daily Saturated Fat Intake', "{:.1f}g"),
+    "🥚 Cholesterol": ('Cholesterol (mg)', PASTEL_COLORS['purple'], "#1A2F37",
+                      '🥚 Daily Cholesterol Intake', "{:.0f}mg"),
+    "🥬 Fiber": ('Fiber (g)', PASTEL_COLORS['yellow_green'], "#C9A94B",
+                '🥬 Daily Fiber Intake', "{:.1f}g"),
+    "🐟 Omega-3": ('Omega-3 (mg)', PASTEL_COLORS['mint'], "#4F8C92",
+                  '🐟 Daily Omega-3 Intake', "{:.0f}mg")
+}
+
+# Seconds loaded data may lag Airtable, as with a plain 5-minute cache. A disk snapshot is only
+# served while younger than DISK_CACHE_TTL (counted from its fetch), and the in-memory caches hold
+# it for at most MEMORY_CACHE_TTL on top, so the two together never exceed DATA_MAX_AGE
+DATA_MAX_AGE = 300
+DISK_CACHE_TTL = DATA_MAX_AGE // 2
+MEMORY_CACHE_TTL = DATA_MAX_AGE - DISK_CACHE_TTL
+
+# Fixed height of the trend chart in pixels; its width follows the container
+TREND_CHART_HEIGHT = 350
 
 # Airtable Configuration
 AIRTABLE_TOKEN = st.secrets["AIRTABLE_TOKEN"]
 BASE_ID = st.secrets["AIRTABLE_BASE_ID"]
 TABLE_ID = st.secrets["AIRTABLE_TABLE_ID"]
 
+# On-disk cache of the parsed table, shared by app processes on this host. The directory is
+# per base/table and only used while it is private to this app's user (see _disk_cache_usable),
+# since the data is personal health data
+DISK_CACHE_DIR = Path(tempfile.gettempdir()) / f"nutrition_dashboard_{BASE_ID}_{TABLE_ID}"
+
 # Set page configuration
 st.set_page_config(
     page_title="Nutrition Dashboard",
@@ -19,94 +129,328 @@ st.set_page_config(
 )
 
 # Load and preprocess data
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def get_airtable_data():
-    """Read nutrition data from Airtable and return as DataFrame"""
+@st.cache_resource
+def _airtable_api():
+    """Airtable client shared by all fetches, so its HTTP session (and keep-alive connection) is reused"""
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=frozenset({'GET', 'POST'}))
+    # (connect, read) timeouts so a stalled request fails instead of hanging the page
+    return Api(AIRTABLE_TOKEN, timeout=(3.05, 10), retry_strategy=retry)
+
+def _date_range_formula(date_from, date_to):
+    """Airtable formula matching entries on the given Singapore calendar days (inclusive)"""
+    start = pd.Timestamp(date_from).tz_localize('Asia/Singapore').tz_convert('UTC')
+    end = (pd.Timestamp(date_to) + pd.Timedelta(days=1)).tz_localize('Asia/Singapore').tz_convert('UTC')
+    return (f"AND(NOT(IS_BEFORE({{Input Date}}, '{start:%Y-%m-%dT%H:%M:%S.000Z}')), "
+            f"IS_BEFORE({{Input Date}}, '{end:%Y-%m-%dT%H:%M:%S.000Z}'))")
+
+@st.cache_resource(ttl=300)  # Cache for 5 minutes
+def _first_entry_date():
+    """Singapore calendar date of the earliest entry, or None when the table is empty"""
+    table = _airtable_api().table(BASE_ID, TABLE_ID)
+    record = table.first(sort=['Input Date'], fields=['Input Date'], formula='{Input Date}')
+    if record is None:
+        return None
+    return pd.to_datetime(record['fields']['Input Date'], utc=True, format='ISO8601').tz_convert('Asia/Singapore').date()
+
+@st.cache_resource(ttl=MEMORY_CACHE_TTL, max_entries=16)  # Shared without copying
+def _fetch_records(date_from, date_to):
+    """Fetch raw records in the date range from Airtable, returning (content key, records, fetch time)"""
+    fetched_at = time.time()
+    table = _airtable_api().table(BASE_ID, TABLE_ID)
+    
+    # Stream only the fields the dashboard uses (no photo attachments) for the selected days,
+    # filtered by Airtable, page by page
+    def fetch(fields):
+        records = []
+        for page in table.iterate(page_size=100, fields=fields,
+                                  formula=_date_range_formula(date_from, date_to)):
+            records.extend(page)
+        return records
+
     try:
-        # Initialize Airtable client
-        api = Api(AIRTABLE_TOKEN)
-        table = api.table(BASE_ID, TABLE_ID)
-        
-        # Fetch all records
-        records = table.all()
-        if not records:
-            print("No records found in Airtable")
-            return pd.DataFrame()
-            
-        # Convert to DataFrame
-        df = pd.DataFrame([record['fields'] for record in records])
+        records = fetch(AIRTABLE_FIELDS)
+    except HTTPError as e:
+        # 422 UNKNOWN_FIELD_NAME when an optional field is missing; any other 422 fails again below
+        if e.response is None or e.response.status_code != 422:
+            raise
+        records = fetch([field for field in AIRTABLE_FIELDS if field not in OPTIONAL_AIRTABLE_FIELDS])
+    # Content hash of the records, used as the cache key for the parsed DataFrame
+    records_key = hashlib.md5(json.dumps(records, sort_keys=True).encode('utf-8')).hexdigest()
+    return records_key, records, fetched_at
+
+@st.cache_resource(max_entries=16)
+def _build_df(records_key, _records):
+    """Parse Airtable records into a DataFrame (shared between reruns, treat as read-only)"""
+    if not _records:
+        print("No records found in Airtable")
+        return pd.DataFrame()
         
-        # Add record IDs
-        df['ID'] = [record['id'] for record in records]
-        df = df.set_index('ID')
-        
-        # Drop any photo/attachment columns
-        photo_cols = [col for col in df.columns if any(x in col.lower() for x in ['photo', 'attachment', 'image'])]
-        df = df.drop(columns=photo_cols, errors='ignore')          # Convert dates from ISO format and handle timezone
-        df['Input Date'] = pd.to_datetime(df['Input Date'], format='ISO8601')
-        # Convert to Singapore timezone, handling both tz-naive and tz-aware times
-        if df['Input Date'].dt.tz is None:
-            df['Input Date'] = df['Input Date'].dt.tz_localize('UTC').dt.tz_convert('Asia/Singapore')
-        else:
-            df['Input Date'] = df['Input Date'].dt.tz_convert('Asia/Singapore')
-        # Convert to dd/mm/yyyy format for display
-        df['Input Date String'] = df['Input Date'].dt.strftime('%d/%m/%Y %I:%M%p')
-        df['Date'] = df['Input Date'].dt.date
+    # Split the records into one list per column in a single pass, so the DataFrame is built
+    # column-wise without unifying per-record dict keys
+    ids = []
+    columns = {field: [] for field in AIRTABLE_FIELDS}
+    for record in _records:
+        ids.append(record['id'])
+        fields = record['fields']
+        for field, values in columns.items():
+            values.append(fields.get(field))
+    df = pd.DataFrame({'ID': ids} | columns)
+
+    # Convert dates to Singapore time. Airtable emits a fixed UTC timestamp format, which takes the
+    # fast strptime path; anything else falls back to general ISO8601 parsing (tz-naive as UTC)
+    try:
+        input_dates = pd.to_datetime(df['Input Date'], format=AIRTABLE_DATE_FORMAT, exact=True, cache=True, utc=True)
+    except ValueError:
+        input_dates = pd.to_datetime(df['Input Date'], utc=True, format='ISO8601')
+    df['Input Date'] = input_dates.dt.tz_convert('Asia/Singapore')
+    # Local calendar day as datetime64 so comparisons and groupby keys stay vectorized
+    df['Date'] = df['Input Date'].dt.tz_localize(None).dt.normalize()
+    # Coerce stray non-numeric cells to NaN, then narrow the storage dtype. Every nutrient, including
+    # the kcal/mg columns, is float32: entries can be fractional and blank cells stay NaN
+    for col in NUTRIENT_COLS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    # Repeated item names group on small integer codes instead of hashed strings
+    df['Item Name'] = df['Item Name'].astype('category')
+    # Sort by day so the raw data table reads in order and the daily groupby can skip key sorting
+    df = df.sort_values('Date', kind='stable').set_index('ID')
+    # Carried through slices so downstream caches can key on the data version
+    df.attrs['records_key'] = records_key
+    
+    return df
+
+def _disk_cache_usable():
+    """Create the cache directory if needed; on POSIX, True only if it is a directory owned by us with mode 0o700.
+    The path in the shared temp dir is predictable, so one made by another user must not be trusted"""
+    try:
+        DISK_CACHE_DIR.mkdir(mode=0o700, exist_ok=True)
+        st_dir = os.lstat(DISK_CACHE_DIR)
+    except OSError as e:
+        print(f"Disk cache unavailable: {str(e)}")
+        return False
+    if not hasattr(os, 'getuid'):
+        # No POSIX owner/mode bits (Windows); the temp dir there is already per-user
+        return stat.S_ISDIR(st_dir.st_mode)
+    if not stat.S_ISDIR(st_dir.st_mode) or st_dir.st_uid != os.getuid() or stat.S_IMODE(st_dir.st_mode) != 0o700:
+        print(f"Disk cache disabled: {DISK_CACHE_DIR} is not a private directory of this user")
+        return False
+    return True
+
+def _clear_disk_cache():
+    """Remove all cached parquet snapshots of this table"""
+    if not _disk_cache_usable():
+        return
+    for path in DISK_CACHE_DIR.glob('airtable_*.parquet'):
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Could not clear disk cache: {str(e)}")
+
+def _prune_disk_cache(prefix):
+    """Remove stale snapshots of any date range and older snapshots of the range being written"""
+    cutoff = time.time() - DISK_CACHE_TTL
+    for path in DISK_CACHE_DIR.glob('airtable_*.parquet'):
+        try:
+            if path.name.startswith(prefix) or path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+def _snapshot_prefix(date_from, date_to):
+    """File name prefix of the disk snapshots for a date range"""
+    return f"airtable_{date_from:%Y%m%d}-{date_to:%Y%m%d}_"
+
+def _fetch_airtable_raw(date_from, date_to):
+    """Fetch and parse the date range from Airtable, then write it to the disk cache"""
+    records_key, records, fetched_at = _fetch_records(date_from, date_to)
+    df = _build_df(records_key, records)
+    if len(df) > 0 and _disk_cache_usable():
+        prefix = _snapshot_prefix(date_from, date_to)
+        path = DISK_CACHE_DIR / f"{prefix}{datetime.fromtimestamp(fetched_at):%Y%m%d%H%M}.parquet"
+        tmp_path = None
+        # Best-effort: a failed write only costs the next process a refetch
+        try:
+            _prune_disk_cache(prefix)
+            # Unique temp file (created 0o600) so concurrent writers of the same range don't collide
+            fd, tmp_name = tempfile.mkstemp(dir=DISK_CACHE_DIR, suffix='.tmp')
+            os.close(fd)
+            tmp_path = Path(tmp_name)
+            df.to_parquet(tmp_path, compression='zstd')
+            # Date the snapshot by its fetch, not its write, since the records may come from memory
+            os.utime(tmp_path, (fetched_at, fetched_at))
+            tmp_path.replace(path)
+        except Exception as e:
+            print(f"Could not write disk cache: {str(e)}")
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+    return df
+
+@st.cache_resource(ttl=MEMORY_CACHE_TTL, max_entries=16)  # Shared without copying
+def _load_df(date_from, date_to):
+    """Read the newest disk snapshot of the range if it is still fresh, otherwise refetch from Airtable"""
+    if not _disk_cache_usable():
+        return _fetch_airtable_raw(date_from, date_to)
+    snapshots = sorted(DISK_CACHE_DIR.glob(f"{_snapshot_prefix(date_from, date_to)}*.parquet"))
+    df = None
+    if snapshots:
+        try:
+            if time.time() - snapshots[-1].stat().st_mtime < DISK_CACHE_TTL:
+                df = pd.read_parquet(snapshots[-1])
+        except Exception as e:
+            # Removed by another process or unreadable (e.g. truncated): treat as a miss and drop it
+            print(f"Could not read disk cache: {str(e)}")
+            snapshots[-1].unlink(missing_ok=True)
+            df = None
+    if df is None:
+        return _fetch_airtable_raw(date_from, date_to)
+    # Older pandas doesn't round-trip attrs through parquet
+    df.attrs.setdefault('records_key', f"{BASE_ID}/{TABLE_ID}/{snapshots[-1].stem}")
+    return df
+
+def get_first_entry_date():
+    """Return the earliest entry date, None for an empty table, or False if Airtable can't be read"""
+    try:
+        return _first_entry_date()
         
-        return df
+    except Exception as e:
+        print(f"Error accessing Airtable: {str(e)}")
+        return False
+
+def get_airtable_data(date_from, date_to):
+    """Read nutrition data between two dates (inclusive) from Airtable and return as DataFrame"""
+    try:
+        return _load_df(date_from, date_to)
         
     except Exception as e:
         print(f"Error accessing Airtable: {str(e)}")
         return None
 
-# Define color palette using earthy tones
-
-# Define color palette using earthy tones
-PASTEL_COLORS = {
-    'blue': '#2A9D8F',      # Protein - Teal
-    'green': '#8AB17D',     # Carbs - Sage Green (added to complement theme)
-    'peach': '#F4A261',     # Fat - Peach
-    'pink': '#E76F51',      # Calories - Coral
-    'magenta': '#E29578',   # Sugar - Light Coral (added to complement theme)
-    'orange': '#EFBC9B',    # Saturated Fat - Light Peach (added to complement theme)
-    'purple': '#264653',    # Cholesterol - Dark Teal
-    'yellow_green': '#E9C46A', # Fiber - Yellow/Gold
-    'mint': '#7EBDC3'       # Omega-3 - Light Teal (added to complement theme)
-}
+# Cheap cache key for the loaded frame: data version plus the day range covered
+DF_HASH_FUNCS = {pd.DataFrame: lambda d: (d.attrs.get('records_key'), len(d), d['Date'].min(), d['Date'].max())}
+
+@st.cache_data(ttl=300, max_entries=16, hash_funcs=DF_HASH_FUNCS)
+def compute_aggregates(df, today):
+    """Compute today's totals, average daily totals and per-day totals for the date range"""
+    # Single groupby pass; the other metrics are derived from the per-day totals.
+    # The frame is already sorted by day, so sort=False still yields days in order.
+    use_numba = AGG_ENGINE is not None and len(df) > NUMBA_MIN_ROWS
+    grouped = df.groupby('Date', sort=False, observed=True)[NUTRIENT_COLS].sum(
+        engine=AGG_ENGINE if use_numba else None,
+        engine_kwargs=AGG_ENGINE_KWARGS if use_numba else None
+    )
+    daily_metrics = grouped.mean(axis=0)
+    # None when there are no entries for today
+    today_metrics = grouped.loc[today] if today in grouped.index else None
+    daily_totals = grouped.reset_index()
+
+    return today_metrics, daily_metrics, daily_totals
+
+def _plotly():
+    """Import plotly on first chart build and register the shared dashboard template"""
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    if "dashboard" not in pio.templates:
+        # Shared Plotly layout defaults, layered on top of the stock plotly template.
+        # The right margin leaves room for the "Average" annotation placed outside the plot area.
+        pio.templates["dashboard"] = go.layout.Template(layout=dict(margin=dict(t=40, b=0, l=0, r=100), showlegend=False))
+        pio.templates.default = "plotly+dashboard"
+    return go, pio
+
+@st.cache_data(ttl=300, max_entries=32)  # Cache for 5 minutes, a few ranges x 4 nutrients
+def make_bar(daily_totals, col, avg, color, hline_color, title, avg_format):
+    """Build a daily bar chart for one nutrient with a dashed line at its average (from daily_metrics)"""
+    go, _ = _plotly()
+    fig = go.Figure(go.Bar(x=daily_totals['Date'].values, y=daily_totals[col].values, marker_color=color))
+    fig.update_layout(title=title, height=TREND_CHART_HEIGHT, xaxis_title='Date', yaxis_title=col)
+    fig.add_hline(y=avg, line_dash="dash", line_color=hline_color,
+                  annotation_text=f"Average: {avg_format.format(avg)}", 
+                  annotation_position="right")
+    return fig
+
+@st.cache_data(ttl=300, max_entries=32, hash_funcs=DF_HASH_FUNCS)  # Cache for 5 minutes, a few ranges x 9 nutrients
+def make_top_foods_bar(df, nutrient):
+    """Build a horizontal bar chart of the 10 food items contributing most of a nutrient"""
+    # Partial sort for the top 10; group key order isn't needed
+    nutrient_by_food = df.groupby('Item Name', sort=False, observed=True)[nutrient].sum().nlargest(10)
+
+    # Bar color based on the selected nutrient
+    go, _ = _plotly()
+    fig = go.Figure(go.Bar(x=nutrient_by_food.values, y=nutrient_by_food.index.astype(str),
+                           orientation='h', marker_color=NUTRIENT_COLORS[nutrient]))
+    # Reverse the y-axis to show highest values at the top
+    fig.update_layout(title=f'Top 10 Food Items by {nutrient}', height=400,
+                      xaxis_title=nutrient, yaxis_title='Item Name',
+                      yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+@st.cache_resource
+def img_to_base64(img_path):
+    return base64.b64encode(Path(img_path).read_bytes()).decode('utf-8')
+
+@st.cache_resource
+def icon_header(title):
+    """Header HTML with the inline growth icon, built once per title"""
+    icon_base64 = img_to_base64("static/images/growth.png")
+    return f"<h1><img src='data:image/png;base64,{icon_base64}' width='30' style='margin-right: 10px; vertical-align: middle;'>{title}</h1>"
+
+# Page sections whose widgets only affect their own output; as fragments they rerun alone
+@st.fragment
+def trend_chart_section(daily_totals, daily_metrics):
+    """Trend chart for the nutrient picked in the radio"""
+    # Only the selected nutrient's chart is built and rendered
+    selected_trend = st.radio("Nutrient", list(TREND_CHARTS), horizontal=True, label_visibility="collapsed")
+    trend_col, *trend_style = TREND_CHARTS[selected_trend]
+    st.plotly_chart(make_bar(daily_totals, trend_col, daily_metrics[trend_col], *trend_style),
+                    use_container_width=True, config={'displayModeBar': False})
+
+@st.fragment
+def nutrient_analysis_section(df):
+    """Top 10 foods chart for the nutrient picked in the selectbox"""
+    st.markdown("<h1>🔍 Detailed Nutrient Analysis</h1>", unsafe_allow_html=True)
+    selected_nutrient = st.selectbox("Select Nutrient", NUTRIENT_COLS)
+    st.plotly_chart(make_top_foods_bar(df, selected_nutrient), use_container_width=True)
+
+@st.fragment
+def raw_data_section(df):
+    """Raw data table, shown when the checkbox is ticked"""
+    st.markdown("<h1>📋 Raw Data</h1>", unsafe_allow_html=True)
+    if st.checkbox("Show raw data"):
+        # Convert to dd/mm/yyyy format for display, only when the table is shown
+        display_df = df.assign(**{'Input Date String': df['Input Date'].dt.strftime('%d/%m/%Y %I:%M%p')})
+        st.dataframe(display_df)
+
+# Section headers with the inline icon
+SUMMARY_HEADER = icon_header("Daily Nutritional Summary")
+TRENDS_HEADER = icon_header("Nutritional Trends")
 
 # Add refresh button in sidebar
 if st.sidebar.button("🔄 Refresh Data"):
-    st.cache_data.clear()
-    st.markdown("""
-        <script>
-            window.parent.location.reload();
-        </script>
-    """, unsafe_allow_html=True)
-
-# Load data
-df = get_airtable_data()
-
-if df is None:
-    st.error("Could not load data. Please check your Airtable configuration.")
-    st.stop()
-
-# Ensure we have data before proceeding
-if len(df) == 0:
-    st.warning("No data available in the selected source.")
-    st.stop()
+    # Only the fetch is invalidated; downstream caches are keyed on the data and rebuild as needed
+    _clear_disk_cache()
+    _load_df.clear()
+    _fetch_records.clear()
+    _first_entry_date.clear()
 
 # Sidebar filters
 st.sidebar.header("Filters")
 
 # Get current date in Singapore timezone (used throughout the app)
-sg_tz = pytz.timezone('Asia/Singapore')
+sg_tz = ZoneInfo('Asia/Singapore')
 sg_now = datetime.now(sg_tz)
 today_date = sg_now.date()
 
-# No need to convert timezone again since it's already done during data loading
-
 # Get the actual start date from the data (first date with actual entries)
-actual_start_date = df['Date'].min()
+actual_start_date = get_first_entry_date()
+
+if actual_start_date is False:
+    st.error("Could not load data. Please check your Airtable configuration.")
+    st.stop()
+
+# Ensure we have data before proceeding
+if actual_start_date is None:
+    st.warning("No data available in the selected source.")
+    st.stop()
+
 actual_end_date = today_date  # Use today's date as the end date
 
 # Update the date range input
@@ -120,299 +464,46 @@ date_range = st.sidebar.date_input(
 # Show the date range info
 st.sidebar.info(f"Data available from {actual_start_date.strftime('%Y-%m-%d')} to {actual_end_date.strftime('%Y-%m-%d')}")
 
-# Filter data based on date range
-mask = (df['Date'] >= date_range[0]) & (df['Date'] <= date_range[1])
-filtered_df = df[mask]
+# Load data; Airtable only returns entries in the selected date range
+filtered_df = get_airtable_data(date_range[0], date_range[1])
 
-# Daily Summary Metrics
-import base64
-from pathlib import Path
+if filtered_df is None:
+    st.error("Could not load data. Please check your Airtable configuration.")
+    st.stop()
 
-def img_to_base64(img_path):
-    with open(img_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode('utf-8')
-        
-# Create header with icon
-icon_base64 = img_to_base64("static/images/growth.png")
-st.markdown(f"<h1><img src='data:image/png;base64,{icon_base64}' width='30' style='margin-right: 10px; vertical-align: middle;'>Daily Nutritional Summary</h1>", unsafe_allow_html=True)
-
-# Calculate today's metrics
-today_metrics = filtered_df[filtered_df['Date'] == today_date].agg({
-    'Calories (kcal)': 'sum',
-    'Protein (g)': 'sum',
-    'Carbohydrates (g)': 'sum',
-    'Fat (g)': 'sum',
-    'Saturated Fat (g)': 'sum',
-    'Cholesterol (mg)': 'sum',
-    'Fiber (g)': 'sum'
-})
-
-# Calculate average daily metrics
-daily_metrics = filtered_df.groupby('Date').agg({
-    'Calories (kcal)': 'sum',
-    'Protein (g)': 'sum',
-    'Carbohydrates (g)': 'sum',
-    'Fat (g)': 'sum',
-    'Saturated Fat (g)': 'sum',
-    'Cholesterol (mg)': 'sum',
-    'Fiber (g)': 'sum'
-}).mean()
-
-# Display metrics in two rows
-st.subheader(f"Today's Intake ({sg_now.strftime('%Y-%m-%d')})")
-
-# Display today's metrics in 6 columns
-col1, col2, col3, col4, col5, col6, col7 = st.columns(7)
-with col1:
-    calories_value = float(today_metrics['Calories (kcal)']) if not pd.isna(today_metrics['Calories (kcal)']) else 0
-    calories_delta = float(today_metrics['Calories (kcal)'] - daily_metrics['Calories (kcal)']) if not pd.isna(today_metrics['Calories (kcal)']) else None
-    st.metric("Calories", 
-              f"{calories_value:.0f} kcal",
-              delta=f"{calories_delta:.0f}" if calories_delta is not None else None)
-with col2:
-    protein_value = float(today_metrics['Protein (g)']) if not pd.isna(today_metrics['Protein (g)']) else 0
-    protein_delta = float(today_metrics['Protein (g)'] - daily_metrics['Protein (g)']) if not pd.isna(today_metrics['Protein (g)']) else None
-    st.metric("Protein", 
-              f"{protein_value:.1f}g",
-              delta=f"{protein_delta:.1f}" if protein_delta is not None else None)
-with col3:
-    carbs_value = float(today_metrics['Carbohydrates (g)']) if not pd.isna(today_metrics['Carbohydrates (g)']) else 0
-    carbs_delta = float(today_metrics['Carbohydrates (g)'] - daily_metrics['Carbohydrates (g)']) if not pd.isna(today_metrics['Carbohydrates (g)']) else None
-    st.metric("Carbs", 
-              f"{carbs_value:.1f}g",
-              delta=f"{carbs_delta:.1f}" if carbs_delta is not None else None)
-with col4:
-    fat_value = float(today_metrics['Fat (g)']) if not pd.isna(today_metrics['Fat (g)']) else 0
-    fat_delta = float(today_metrics['Fat (g)'] - daily_metrics['Fat (g)']) if not pd.isna(today_metrics['Fat (g)']) else None
-    st.metric("Fat", 
-              f"{fat_value:.1f}g",
-              delta=f"{fat_delta:.1f}" if fat_delta is not None else None)
-with col5:
-    sat_fat_value = float(today_metrics['Saturated Fat (g)']) if not pd.isna(today_metrics['Saturated Fat (g)']) else 0
-    sat_fat_delta = float(today_metrics['Saturated Fat (g)'] - daily_metrics['Saturated Fat (g)']) if not pd.isna(today_metrics['Saturated Fat (g)']) else None
-    st.metric("Sat. Fat", 
-              f"{sat_fat_value:.1f}g",
-              delta=f"{sat_fat_delta:.1f}" if sat_fat_delta is not None else None)
-with col6:
-    chol_value = float(today_metrics['Cholesterol (mg)']) if not pd.isna(today_metrics['Cholesterol (mg)']) else 0
-    chol_delta = float(today_metrics['Cholesterol (mg)'] - daily_metrics['Cholesterol (mg)']) if not pd.isna(today_metrics['Cholesterol (mg)']) else None
-    st.metric("Cholesterol", 
-              f"{chol_value:.0f}mg",
-              delta=f"{chol_delta:.0f}" if chol_delta is not None else None)
-with col7:
-    fiber_value = float(today_metrics['Fiber (g)']) if not pd.isna(today_metrics['Fiber (g)']) else 0
-    fiber_delta = float(today_metrics['Fiber (g)'] - daily_metrics['Fiber (g)']) if not pd.isna(today_metrics['Fiber (g)']) else None
-    st.metric("Fiber", 
-              f"{fiber_value:.1f}g",
-              delta=f"{fiber_delta:.1f}" if fiber_delta is not None else None)
-
-st.subheader("Average Daily Intake")
-col1, col2, col3, col4, col5, col6, col7 = st.columns(7)
-with col1:
-    st.metric("Calories", f"{daily_metrics['Calories (kcal)']:.0f} kcal")
-with col2:
-    st.metric("Protein", f"{daily_metrics['Protein (g)']:.1f}g")
-with col3:
-    st.metric("Carbs", f"{daily_metrics['Carbohydrates (g)']:.1f}g")
-with col4:
-    st.metric("Fat", f"{daily_metrics['Fat (g)']:.1f}g")
-with col5:
-    st.metric("Sat. Fat", f"{daily_metrics['Saturated Fat (g)']:.1f}g")
-with col6:
-    st.metric("Cholesterol", f"{daily_metrics['Cholesterol (mg)']:.0f}mg")
-with col7:
-    st.metric("Fiber", f"{daily_metrics['Fiber (g)']:.1f}g")
+if filtered_df.empty:
+    st.info("No data in the selected date range.")
+    st.stop()
 
+# Daily Summary Metrics
+st.markdown(SUMMARY_HEADER, unsafe_allow_html=True)
 
+# Aggregate once per loaded frame so widget-driven reruns hit the cache
+today_metrics, daily_metrics, daily_totals = compute_aggregates(filtered_df, pd.Timestamp(today_date))
 
-# Trends over time
-st.markdown(f"<h1><img src='data:image/png;base64,{icon_base64}' width='30' style='margin-right: 10px; vertical-align: middle;'>Nutritional Trends</h1>", unsafe_allow_html=True)
-
-tabs = st.tabs(["🔥 Calories", "🥩 Protein", "🍚 Carbohydrates", "🍯 Sugar", "🥑 Fat", "🧈 Saturated Fat", 
-                "🥚 Cholesterol", "🥬 Fiber", "🐟 Omega-3"])
-
-# Process the daily totals for all nutrients
-daily_totals = filtered_df.groupby('Date').agg({
-    'Calories (kcal)': 'sum',
-    'Protein (g)': 'sum',
-    'Carbohydrates (g)': 'sum',
-    'Sugar (g)': 'sum',
-    'Fat (g)': 'sum',
-    'Saturated Fat (g)': 'sum',
-    'Cholesterol (mg)': 'sum',
-    'Fiber (g)': 'sum',
-    'Omega-3 (mg)': 'sum'
-}).reset_index()
-
-# Calories tab
-with tabs[0]:
-    fig_calories = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Calories (kcal)',
-        title='🔥 Daily Caloric Intake'
-    )
-    fig_calories.update_traces(marker_color=PASTEL_COLORS['pink'])
-    avg_calories = daily_totals['Calories (kcal)'].mean()
-    fig_calories.add_hline(y=avg_calories, line_dash="dash", line_color="#BA4F3C",
-                          annotation_text=f"Average: {avg_calories:.0f} kcal", 
-                          annotation_position="right")
-    st.plotly_chart(fig_calories, use_container_width=True)
-
-# Protein tab
-with tabs[1]:
-    fig_protein = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Protein (g)',
-        title='🥩 Daily Protein Intake'
-    )
-    fig_protein.update_traces(marker_color=PASTEL_COLORS['blue'])
-    avg_protein = daily_totals['Protein (g)'].mean()
-    fig_protein.add_hline(y=avg_protein, line_dash="dash", line_color="#1D7268",
-                         annotation_text=f"Average: {avg_protein:.1f}g", 
-                         annotation_position="right")
-    st.plotly_chart(fig_protein, use_container_width=True)
-
-# Carbohydrates tab
-with tabs[2]:
-    fig_carbs = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Carbohydrates (g)',
-        title='🍚 Daily Carbohydrate Intake'
-    )
-    fig_carbs.update_traces(marker_color=PASTEL_COLORS['green'])
-    avg_carbs = daily_totals['Carbohydrates (g)'].mean()
-    fig_carbs.add_hline(y=avg_carbs, line_dash="dash", line_color="#68935F",
-                       annotation_text=f"Average: {avg_carbs:.1f}g", 
-                       annotation_position="right")
-    st.plotly_chart(fig_carbs, use_container_width=True)
-
-# Sugar tab
-with tabs[3]:
-    fig_sugar = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Sugar (g)',
-        title='🍯 Daily Sugar Intake'
-    )
-    fig_sugar.update_traces(marker_color=PASTEL_COLORS['magenta'])
-    avg_sugar = daily_totals['Sugar (g)'].mean()
-    fig_sugar.add_hline(y=avg_sugar, line_dash="dash", line_color="#C17A60",
-                       annotation_text=f"Average: {avg_sugar:.1f}g", 
-                       annotation_position="right")
-    st.plotly_chart(fig_sugar, use_container_width=True)
-
-# Fat tab
-with tabs[4]:
-    fig_fat = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Fat (g)',
-        title='🥑 Daily Fat Intake'
-    )
-    fig_fat.update_traces(marker_color=PASTEL_COLORS['peach'])
-    avg_fat = daily_totals['Fat (g)'].mean()
-    fig_fat.add_hline(y=avg_fat, line_dash="dash", line_color="#D28745",
-                     annotation_text=f"Average: {avg_fat:.1f}g", 
-                     annotation_position="right")
-    st.plotly_chart(fig_fat, use_container_width=True)
-
-# Saturated Fat tab
-with tabs[5]:
-    fig_sat_fat = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Saturated Fat (g)',
-        title='🧈 Daily Saturated Fat Intake'
-    )
-    fig_sat_fat.update_traces(marker_color=PASTEL_COLORS['orange'])
-    avg_sat_fat = daily_totals['Saturated Fat (g)'].mean()
-    fig_sat_fat.add_hline(y=avg_sat_fat, line_dash="dash", line_color="#C9966E",
-                         annotation_text=f"Average: {avg_sat_fat:.1f}g", 
-                         annotation_position="right")
-    st.plotly_chart(fig_sat_fat, use_container_width=True)
-
-# Cholesterol tab
-with tabs[6]:
-    fig_chol = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Cholesterol (mg)',
-        title='🥚 Daily Cholesterol Intake'
-    )
-    fig_chol.update_traces(marker_color=PASTEL_COLORS['purple'])
-    avg_chol = daily_totals['Cholesterol (mg)'].mean()
-    fig_chol.add_hline(y=avg_chol, line_dash="dash", line_color="#1A2F37",
-                       annotation_text=f"Average: {avg_chol:.0f}mg", 
-                       annotation_position="right")
-    st.plotly_chart(fig_chol, use_container_width=True)
-
-# Fiber tab
-with tabs[7]:
-    fig_fiber = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Fiber (g)',
-        title='🥬 Daily Fiber Intake'
-    )
-    fig_fiber.update_traces(marker_color=PASTEL_COLORS['yellow_green'])
-    avg_fiber = daily_totals['Fiber (g)'].mean()
-    fig_fiber.add_hline(y=avg_fiber, line_dash="dash", line_color="#C9A94B",
-                       annotation_text=f"Average: {avg_fiber:.1f}g", 
-                       annotation_position="right")
-    st.plotly_chart(fig_fiber, use_container_width=True)
-
-# Omega-3 tab
-with tabs[8]:
-    fig_omega = px.bar(
-        daily_totals, 
-        x='Date', 
-        y='Omega-3 (mg)',
-        title='🐟 Daily Omega-3 Intake'
-    )
-    fig_omega.update_traces(marker_color=PASTEL_COLORS['mint'])
-    avg_omega = daily_totals['Omega-3 (mg)'].mean()
-    fig_omega.add_hline(y=avg_omega, line_dash="dash", line_color="#4F8C92",
-                       annotation_text=f"Average: {avg_omega:.0f}mg", 
-                       annotation_position="right")
-    st.plotly_chart(fig_omega, use_container_width=True)
+# Display today's metrics (delta against the daily average) above the average, in one column layout
+st.subheader(f"Today's Intake ({sg_now.strftime('%Y-%m-%d')}) and Average Daily Intake")
 
-# Detailed nutrient analysis
-st.markdown("<h1>🔍 Detailed Nutrient Analysis</h1>", unsafe_allow_html=True)
-nutrients = ['Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Sugar (g)',
-            'Fat (g)', 'Saturated Fat (g)', 'Cholesterol (mg)', 'Fiber (g)', 'Omega-3 (mg)']
+# Pull the metric columns out once as arrays instead of looking up each nutrient in the Series
+avg_values = daily_metrics[METRIC_COLS].to_numpy(dtype=float)
+today_values = None if today_metrics is None else today_metrics[METRIC_COLS].to_numpy(dtype=float)
 
-# Map nutrients to their corresponding colors from the new theme
-nutrient_colors = {
-    'Calories (kcal)': '#E76F51',      # Coral
-    'Protein (g)': '#2A9D8F',          # Teal
-    'Carbohydrates (g)': '#8AB17D',    # Sage Green
-    'Sugar (g)': '#E29578',            # Light Coral
-    'Fat (g)': '#F4A261',              # Peach
-    'Saturated Fat (g)': '#EFBC9B',    # Light Peach
-    'Cholesterol (mg)': '#264653',     # Dark Teal
-    'Fiber (g)': '#E9C46A',            # Yellow/Gold
-    'Omega-3 (mg)': '#7EBDC3'          # Light Teal
-}
+for i, (col, (label, _, value_format, delta_format)) in enumerate(zip(st.columns(len(METRICS)), METRICS)):
+    if today_values is None:
+        col.metric(label, value_format.format(0))
+    else:
+        col.metric(label,
+                   value_format.format(today_values[i]),
+                   delta=delta_format.format(today_values[i] - avg_values[i]))
+    col.metric(f"Avg. {label}", value_format.format(avg_values[i]))
+
+# Trends over time
+st.markdown(TRENDS_HEADER, unsafe_allow_html=True)
 
-selected_nutrient = st.selectbox("Select Nutrient", nutrients)
-nutrient_by_food = filtered_df.groupby('Item Name')[selected_nutrient].sum().sort_values(ascending=False).head(10)
+trend_chart_section(daily_totals, daily_metrics)
 
-fig_nutrients = px.bar(
-    nutrient_by_food,
-    orientation='h',
-    title=f'Top 10 Food Items by {selected_nutrient}',
-    height=400
-)
-# Set the color based on the selected nutrient
-fig_nutrients.update_traces(marker_color=nutrient_colors[selected_nutrient])
-# Reverse the y-axis to show highest values at the top
-fig_nutrients.update_layout(yaxis={'categoryorder': 'total ascending'})
-st.plotly_chart(fig_nutrients, use_container_width=True)
+# Detailed nutrient analysis
+nutrient_analysis_section(filtered_df)
 
 # Display raw data
-st.markdown("<h1>📋 Raw Data</h1>", unsafe_allow_html=True)
-if st.checkbox("Show raw data"):
-    st.dataframe(filtered_df)
+raw_data_section(filtered_df)